@@ -9,7 +9,6 @@ from hivemind.utils.logging import get_logger
 from humanfriendly import parse_size
 
 from subnet.constants import DTYPE_MAP, PUBLIC_INITIAL_PEERS
-from subnet.server.server import Server
 from subnet.utils.convert_block import QuantType
 from subnet.utils.version import validate_version
 
@@ -166,6 +165,10 @@ def main():
 
     # fmt:on
     args = vars(parser.parse_args())
+
+    # the server module itself is only imported once the arguments are valid
+    from subnet.server.server import Server
+
     args.pop("config", None)
 
     args["converted_model_name_or_path"] = args.pop("model") or args["converted_model_name_or_path"]
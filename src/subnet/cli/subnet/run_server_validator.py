@@ -18,7 +18,6 @@ from cryptography.hazmat.primitives.asymmetric import ed25519
 from humanfriendly import parse_size
 
 from subnet.constants import DTYPE_MAP, PUBLIC_INITIAL_PEERS
-from subnet.server.server_validator import Server
 from subnet.substrate.chain_functions import get_subnet_id_by_path
 from subnet.substrate.config import SubstrateConfigCustom
 from subnet.utils.convert_block import QuantType
@@ -185,6 +184,10 @@ def main():
 
     # fmt:on
     args = vars(parser.parse_args())
+
+    # the server module itself is only imported once the arguments are valid
+    from subnet.server.server_validator import Server
+
     args.pop("config", None)
     local = args.pop("local")
     no_consensus = args.pop("no_consensus")
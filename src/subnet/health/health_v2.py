@@ -13,7 +13,7 @@ from tenacity import retry, stop_after_attempt, wait_exponential
 
 # import config
 from .config import *
-from .p2p_utils import check_reachability_parallel, get_peers_ips, extract_peer_ip_info
+from .p2p_utils import check_bootstrap_and_servers_reachability, check_reachability_parallel, get_peers_ips, extract_peer_ip_info
 
 logger = hivemind.get_logger(__name__)
 
@@ -150,9 +150,6 @@ def fetch_health_state3(dht: hivemind.DHT) -> dict:
             if peer_id not in bootstrap_peer_ids:
                 bootstrap_peer_ids.append(peer_id)
 
-        reach_infos = dht.run_coroutine(partial(check_reachability_parallel, bootstrap_peer_ids))
-        bootstrap_states = ["online" if reach_infos[peer_id]["ok"] else "unreachable" for peer_id in bootstrap_peer_ids]
-
         model = MODEL
 
         logger.info(f"Fetching info for models {model}")
@@ -173,7 +170,11 @@ def fetch_health_state3(dht: hivemind.DHT) -> dict:
 
         online_servers = [peer_id for peer_id, span in all_servers.items() if span.state == ServerState.ONLINE]
 
-        reach_infos.update(dht.run_coroutine(partial(check_reachability_parallel, online_servers, fetch_info=True)))
+        # bootstrap peers and servers are checked in one round of concurrent requests
+        reach_infos = dht.run_coroutine(
+            partial(check_bootstrap_and_servers_reachability, bootstrap_peer_ids, online_servers)
+        )
+        bootstrap_states = ["online" if reach_infos[peer_id]["ok"] else "unreachable" for peer_id in bootstrap_peer_ids]
 
         block_healthy = np.zeros(model.num_blocks, dtype=bool)
         server_rows = []
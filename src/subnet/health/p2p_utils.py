@@ -8,6 +8,9 @@ from subnet.server.handler import TransformerConnectionHandler
 
 info_cache = hivemind.TimedStorage()
 
+# Matches the DHT clients ``num_workers`` in the scoring protocol
+MAX_REACHABILITY_CHECKS = 32
+
 
 async def check_reachability(peer_id, _, node, *, fetch_info=False, connect_timeout=5, expiration=300, use_cache=True):
     if use_cache:
@@ -41,13 +44,32 @@ async def check_reachability(peer_id, _, node, *, fetch_info=False, connect_time
     return rpc_info
 
 
-async def check_reachability_parallel(peer_ids, dht, node, *, fetch_info=False):
-    rpc_infos = await asyncio.gather(
-        *[check_reachability(peer_id, dht, node, fetch_info=fetch_info) for peer_id in peer_ids]
-    )
+async def check_reachability_parallel(
+    peer_ids, dht, node, *, fetch_info=False, max_concurrency=MAX_REACHABILITY_CHECKS, semaphore=None
+):
+    # a given ``semaphore`` bounds checks shared with other calls, ``max_concurrency`` is then ignored
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _check_reachability(peer_id):
+        async with semaphore:
+            return await check_reachability(peer_id, dht, node, fetch_info=fetch_info)
+
+    rpc_infos = await asyncio.gather(*[_check_reachability(peer_id) for peer_id in peer_ids])
     return dict(zip(peer_ids, rpc_infos))
 
 
+async def check_bootstrap_and_servers_reachability(bootstrap_peer_ids, server_peer_ids, dht, node):
+    """Checks bootstrap peers and servers concurrently, server results take precedence"""
+    # one semaphore for both rounds so at most ``MAX_REACHABILITY_CHECKS`` are in flight in total
+    semaphore = asyncio.Semaphore(MAX_REACHABILITY_CHECKS)
+    bootstrap_infos, server_infos = await asyncio.gather(
+        check_reachability_parallel(bootstrap_peer_ids, dht, node, semaphore=semaphore),
+        check_reachability_parallel(server_peer_ids, dht, node, fetch_info=True, semaphore=semaphore),
+    )
+    return {**bootstrap_infos, **server_infos}
+
+
 async def get_peers_ips(dht, dht_node):
     return await dht_node.p2p.list_peers()
 
@@ -4,13 +4,12 @@ Licence: MIT
 Author: Yuma Rao
 """
 
-import ast
 from enum import Enum
 import json
 import scalecodec
 from dataclasses import dataclass
 from scalecodec.base import RuntimeConfiguration, ScaleBytes
-from typing import List, Dict, Optional, Any, Union
+from typing import Iterator, List, Dict, Optional, Any, Union
 from scalecodec.type_registry import load_type_registry_preset
 from scalecodec.utils.ss58 import ss58_encode
 from hivemind import PeerID
@@ -243,27 +242,17 @@ class RewardsData:
   @classmethod
   def list_from_scale_info(cls, scale_info: Any) -> List["RewardsData"]:
     """Returns a list of RewardsData objects from a ``decoded_list``."""
+    return list(cls.iter_from_scale_info(scale_info))
 
-    encoded_list = []
-    for code in map(ord, str(scale_info)):
-      encoded_list.append(code)
-
-
-    decoded = ''.join(map(chr, encoded_list))
-
-    json_data = ast.literal_eval(json.dumps(decoded))
-
-    decoded_list = []
+  @classmethod
+  def iter_from_scale_info(cls, scale_info: Any) -> Iterator["RewardsData"]:
+    """Yields RewardsData objects from a ``decoded_list`` one at a time."""
     for item in scale_info:
-      decoded_list.append(
-        RewardsData(
-          peer_id=str(item["peer_id"]),
-          score=int(str(item["score"])),
-        )
+      yield RewardsData(
+        peer_id=str(item["peer_id"]),
+        score=int(str(item["score"])),
       )
 
-    return decoded_list
-
   @staticmethod
   def _rewards_data_to_namespace(rewards_data) -> "RewardsData":
     """
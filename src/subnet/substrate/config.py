@@ -2,13 +2,246 @@
 Substrate config file for storing blockchain configuration and parameters in a pickle
 to avoid remote blockchain calls
 """
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from scalecodec.base import ScaleBytes
 from substrateinterface import SubstrateInterface, Keypair
+from substrateinterface.exceptions import SubstrateRequestException
+from substrateinterface.storage import StorageKey
+from tenacity import retry, stop_after_attempt, wait_fixed
+from websocket import WebSocketConnectionClosedException
+
+logger = logging.getLogger(__name__)
 
 BLOCK_SECS = 6
 
+# seconds to wait on an HTTP batch request before it's retried
+HTTP_TIMEOUT = BLOCK_SECS * 2
+
+# TCP keepalive starts probing a websocket after 30 idle seconds, once per block, so proxies and load
+# balancers don't time it out between epochs, the kernels default idle time is 2 hours
+# a connection that is dropped anyway is reopened by ``PersistentSubstrateInterface.rpc_request``
+KEEPALIVE_SOCKOPT = ((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),)
+if hasattr(socket, 'TCP_KEEPIDLE'):
+  KEEPALIVE_SOCKOPT += (
+    (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, BLOCK_SECS * 5),
+    (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, BLOCK_SECS),
+    (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3),
+  )
+
+# errors raised by a websocket the node or network has dropped
+CONNECTION_ERRORS = (BrokenPipeError, ConnectionResetError, WebSocketConnectionClosedException)
+
+class PersistentSubstrateInterface(SubstrateInterface):
+  """
+  ``SubstrateInterface`` that keeps one websocket open for its lifetime
+
+  ``chain_functions`` wrap each query in ``with substrate as _substrate``, which closes the
+  connection on exit and forces a new TCP and TLS handshake on the next query
+
+  Requests are serialized by ``request_lock`` so threads sharing the interface never read each others responses
+  """
+  def __init__(self, *args, **kwargs):
+    # set before ``super().__init__``, which may already send requests
+    self.request_lock = threading.RLock()
+    super().__init__(*args, **kwargs)
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    # keep the connection open, see ``close`` to release it
+    pass
+
+  def rpc_request(self, method, params, result_handler=None):
+    """Reconnects once and resends if the websocket was dropped"""
+    with self.request_lock:
+      try:
+        return super().rpc_request(method, params, result_handler=result_handler)
+      except CONNECTION_ERRORS:
+        if self.url is None or not (self.url[0:6] == 'wss://' or self.url[0:5] == 'ws://'):
+          raise
+        self.connect_websocket()
+        return super().rpc_request(method, params, result_handler=result_handler)
+
 class SubstrateConfigCustom:
   def __init__(self, phrase, url):
     self.url = url
-    self.interface: SubstrateInterface = SubstrateInterface(url=url)
+    self.interface: SubstrateInterface = PersistentSubstrateInterface(
+      url=url,
+      ws_options={'sockopt': KEEPALIVE_SOCKOPT}
+    )
     self.keypair = Keypair.create_from_uri(phrase)
-    self.account_id = Keypair.create_from_uri(phrase).ss58_address
\ No newline at end of file
+    self.account_id = Keypair.create_from_uri(phrase).ss58_address
+
+    # consumers of the new heads subscription, see ``subscribe_new_heads``
+    self._head_subscribers: List[Tuple[queue.Queue, threading.Event]] = []
+    self._head_lock = threading.Lock()
+    self._head_thread: Optional[threading.Thread] = None
+
+  def _is_websocket(self) -> bool:
+    return self.url[0:6] == 'wss://' or self.url[0:5] == 'ws://'
+
+  def reconnect_if_dead(self):
+    """Reopens the websocket if it was closed"""
+    if self._is_websocket() and (self.interface.websocket is None or not self.interface.websocket.connected):
+      self.interface.connect_websocket()
+
+  @retry(wait=wait_fixed(BLOCK_SECS+1), stop=stop_after_attempt(4))
+  def _batch_rpc(self, calls: List[Tuple[str, list]]) -> Dict[int, Dict]:
+    """
+    Sends multiple JSON-RPC requests as one JSON-RPC 2.0 batch so a single round trip covers all of them
+
+    :param calls: list of ``(method, params)``
+    :returns: responses keyed by the index of their call in ``calls``
+    """
+    with self.interface.request_lock:
+      # ids are taken from the interfaces counter so they never collide with its own requests
+      first_id = self.interface.request_id
+      self.interface.request_id += len(calls)
+      payload = [
+        {"jsonrpc": "2.0", "id": first_id + index, "method": method, "params": params}
+        for index, (method, params) in enumerate(calls)
+      ]
+
+      if self._is_websocket():
+        self.reconnect_if_dead()
+        try:
+          self.interface.websocket.send(json.dumps(payload))
+        except CONNECTION_ERRORS:
+          self.interface.connect_websocket()
+          self.interface.websocket.send(json.dumps(payload))
+        responses = self._recv_batch({request['id'] for request in payload})
+      else:
+        response = requests.post(
+          self.url,
+          data=json.dumps(payload),
+          headers=self.interface.default_headers,
+          timeout=HTTP_TIMEOUT
+        )
+        if response.status_code != 200:
+          raise SubstrateRequestException("RPC batch request failed with HTTP status code {}".format(response.status_code))
+        responses = response.json()
+
+    # nodes reply with a single error object if the batch itself is rejected
+    if not isinstance(responses, list):
+      raise SubstrateRequestException(responses.get('error', responses))
+
+    return {response['id'] - first_id: response for response in responses}
+
+  def _recv_batch(self, ids: set):
+    """
+    Reads websocket frames until the reply to the batch with ``ids``
+
+    Frames left on the persistent connection, e.g. replies to requests that were retried, are dropped
+    """
+    while True:
+      message = json.loads(self.interface.websocket.recv())
+      if isinstance(message, list):
+        if {response.get('id') for response in message} == ids:
+          return message
+      elif message.get('id') is None and 'error' in message:
+        # the batch itself was rejected
+        return message
+
+  def query_with_block_number(self, queries: List[Tuple[str, str, Optional[list]]]) -> Tuple[int, List[Any]]:
+    """
+    Queries the current block number and storage functions in one batched request
+
+    :param queries: list of ``(module, storage_function, params)``
+    :returns: block number and the decoded storage items in the order of ``queries``
+    """
+    # storage keys are built from the loaded metadata directly, ``create_storage_key``
+    # would re-initialize the runtime on each call and cost additional round trips
+    if self.interface.metadata is None:
+      self.interface.init_runtime()
+
+    storage_keys = [
+      StorageKey.create_from_storage_function(
+        module,
+        storage_function,
+        params,
+        runtime_config=self.interface.runtime_config,
+        metadata=self.interface.metadata
+      ) for module, storage_function, params in queries
+    ]
+
+    calls = [('chain_getHeader', [])]
+    calls += [('state_getStorage', [storage_key.to_hex()]) for storage_key in storage_keys]
+
+    responses = self._batch_rpc(calls)
+    for response in responses.values():
+      if 'error' in response:
+        raise SubstrateRequestException(response['error'])
+
+    block_number = int(responses[0]['result']['number'], 16)
+
+    results = []
+    for id, storage_key in enumerate(storage_keys, start=1):
+      data = responses[id]['result']
+      results.append(storage_key.decode_scale_value(None if data is None else ScaleBytes(data)))
+
+    return block_number, results
+
+  def subscribe_new_heads(self, head_queue: queue.Queue, stop: threading.Event) -> bool:
+    """
+    Feeds new block headers from a ``chain_subscribeNewHeads`` subscription into ``head_queue``
+
+    A subscription holds its connection, so it runs on its own interface in a daemon thread.
+    All subscribers of this config share the one subscription, which ends once each of their ``stop`` is set.
+    Only the latest header is kept in ``head_queue``.
+    Subscriptions require a websocket, for HTTP urls this does nothing and callers should poll the block number.
+
+    :param head_queue: queue receiving raw header dicts, e.g. ``{"number": "0x1a2b", ...}``
+    :param stop: removes ``head_queue`` from the subscription once set
+    :returns: if subscribed, ``False`` on HTTP urls
+    """
+    if not self._is_websocket():
+      return False
+
+    with self._head_lock:
+      self._head_subscribers.append((head_queue, stop))
+      if self._head_thread is None:
+        self._head_thread = threading.Thread(target=self._run_new_heads_subscription, daemon=True)
+        self._head_thread.start()
+    return True
+
+  def _run_new_heads_subscription(self):
+    def subscription_handler(message, update_nr, subscription_id):
+      with self._head_lock:
+        self._head_subscribers = [(q, stop) for q, stop in self._head_subscribers if not stop.is_set()]
+        subscribers = list(self._head_subscribers)
+
+      # returning a value ends the subscription
+      if not subscribers:
+        return True
+
+      header = message['params']['result']
+      for head_queue, _ in subscribers:
+        # drop the unread header, if any, so the queue always holds the latest one
+        try:
+          head_queue.get_nowait()
+        except queue.Empty:
+          pass
+        head_queue.put_nowait(header)
+
+    while True:
+      with self._head_lock:
+        self._head_subscribers = [(q, stop) for q, stop in self._head_subscribers if not stop.is_set()]
+        if not self._head_subscribers:
+          self._head_thread = None
+          return
+      try:
+        interface = SubstrateInterface(url=self.url)
+        try:
+          interface.rpc_request('chain_subscribeNewHeads', [], result_handler=subscription_handler)
+        finally:
+          # release the websocket of a failed subscription before resubscribing
+          interface.close()
+      except Exception as e:
+        logger.warning("New heads subscription failed, resubscribing: %s" % e, exc_info=True)
+        time.sleep(BLOCK_SECS)
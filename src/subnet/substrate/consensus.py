@@ -1,19 +1,19 @@
-from dataclasses import asdict
+from dataclasses import fields
 from enum import Enum
+import queue
 import threading
-import time
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 from hivemind.utils.auth import AuthorizerBase
 
 from subnet.health.state_updater import ScoringProtocol
-from subnet.substrate.chain_data import RewardsData
+from subnet.substrate.chain_data import RewardsData, SubnetNode
 from subnet.substrate.chain_functions import activate_subnet, attest, get_block_number, get_epoch_length, get_reward_result_event, get_subnet_data, get_subnet_id_by_path, get_rewards_submission, get_rewards_validator, validate
 from subnet.substrate.config import BLOCK_SECS, SubstrateConfigCustom
 from subnet.substrate.utils import get_included_nodes, get_consensus_data, get_next_epoch_start_block, get_submittable_nodes
 from hivemind.utils import get_logger
 
-from subnet.utils.math import saturating_div, saturating_sub
+from subnet.utils.math import saturating_div
 import logging
 
 logger = get_logger(__name__)
@@ -32,6 +32,31 @@ logging.basicConfig(
 
 MAX_ATTEST_CHECKS = 3
 
+# length of each submittable node's subnet activation window
+_BLOCK_SECS_X10 = BLOCK_SECS * 10
+
+# attestors need at least this long into an epoch to run the scoring protocol
+_MIN_ATTEST_DELTA = BLOCK_SECS * 2
+
+# field names of ``RewardsData`` in a fixed order for building comparable tuples
+_REWARDS_FIELDS = sorted(field.name for field in fields(RewardsData))
+
+def _to_int(x) -> int:
+  """
+  Returns a substrate integer as ``int``, ``ScaleType`` values are read from ``.value``
+  """
+  return int(getattr(x, 'value', x))
+
+def _canonicalize(d) -> tuple:
+  """
+  Returns rewards data as a tuple of its field values
+
+  Accepts decoded ``RewardsData`` from the blockchain or the dictionaries from the scoring protocol
+  """
+  if isinstance(d, dict):
+    return tuple(d[f] for f in _REWARDS_FIELDS)
+  return tuple(getattr(d, f) for f in _REWARDS_FIELDS)
+
 class AttestReason(Enum):
   WAITING = 1
   ATTESTED = 2
@@ -59,21 +84,49 @@ class Consensus(threading.Thread):
     self.subnet_node_eligible = False
     self.subnet_activated = 9223372036854775807 # max int
     self.last_validated_or_attested_epoch = 0
+    self.last_block_number = 0
     self.authorizer = authorizer
 
     self.substrate_config = substrate
     self.account_id = substrate.account_id
 
-    self.previous_epoch_data = None
+    # our last computed consensus data as canonical tuples of primitives, see ``_canonicalize``
+    # no decoded chain objects or scoring protocol dicts are held across epochs
+    self.previous_epoch_data: Optional[Set[tuple]] = None
+
+    # chain lookups reused across iterations
+    # the subnet ID at a path and a subnets activation block never change,
+    # and validators and submission data are keyed by epoch
+    # submission attestations grow as nodes attest so they're always read fresh
+    self._subnet_id_cache = None
+    self._activation_block_cache: Optional[int] = None # initialized + registration blocks
+    self._validator_cache = {}
+    self._submission_data_cache = {}
+
+    # scoring protocol results keyed by epoch
+    self._my_consensus_cache: Dict[int, List] = {}
+
+    # account IDs that attested a submission, keyed by ``(epoch, attestation count)``
+    self._attesters_cache = None
+
+    # previous epochs onchain submission as canonical tuples, keyed by that epoch
+    self._prev_epoch_onchain_cache: Dict[int, Optional[set]] = {}
+
+    # submittable nodes indexed by account ID, keyed by ``(subnet_id, epoch)``
+    self._submittable_index_cache = None
 
     # blockchain constants
-    self.epoch_length = int(str(get_epoch_length(self.substrate_config.interface)))
+    self.epoch_length = _to_int(get_epoch_length(self.substrate_config.interface))
 
     # initialize DHT client for scoring protocol
     self.scoring_protocol = ScoringProtocol(self.authorizer)
 
     self.stop = threading.Event()
 
+    # new block headers pushed by the blockchain, see ``_wait_for_next_block``
+    self._head_queue = queue.Queue(maxsize=1)
+    self._subscribed_new_heads = self.substrate_config.subscribe_new_heads(self._head_queue, self.stop)
+
     self.start()
 
   def run(self):
@@ -83,11 +136,16 @@ class Consensus(threading.Thread):
     while not self.stop.is_set():
       try:
         # get epoch
-        block_number = get_block_number(self.substrate_config.interface)
+        # once the subnet accepts consensus the epochs validator and submission are read in the same round trip
+        if self.subnet_accepting_consensus:
+          block_number, rewards_validator, rewards_submission = self._get_epoch_state()
+        else:
+          block_number, _ = self.substrate_config.query_with_block_number([])
+          self.last_block_number = block_number
 
         logger.info("Block height: %s " % block_number)
 
-        epoch = int(block_number / self.epoch_length)
+        epoch = block_number // self.epoch_length
         logger.info("Epoch: %s " % epoch)
 
         next_epoch_start_block = get_next_epoch_start_block(
@@ -99,7 +157,8 @@ class Consensus(threading.Thread):
         # skip if already validated or attested epoch
         if epoch <= self.last_validated_or_attested_epoch and self.subnet_accepting_consensus:
           logger.info("Already completed epoch: %s, waiting for the next " % epoch)
-          time.sleep(remaining_blocks_until_next_epoch * BLOCK_SECS)
+          if self._sleep_until_next_epoch(next_epoch_start_block, remaining_blocks_until_next_epoch):
+            return
           continue
 
         # Ensure subnet is activated
@@ -117,7 +176,8 @@ class Consensus(threading.Thread):
             continue
           else:
             # Sleep until voting is complete
-            time.sleep(BLOCK_SECS)
+            if self._sleep(BLOCK_SECS):
+              return
             continue
 
         """
@@ -129,16 +189,9 @@ class Consensus(threading.Thread):
         # - Must stake onchain
         # - Must be Submittable subnet node class
         if self.subnet_node_eligible == False:
-          submittable_nodes = get_submittable_nodes(
-            self.substrate_config.interface,
-            self.subnet_id,
-          )
-
           #  wait until we are submittable
-          for node_set in submittable_nodes:
-            if node_set.account_id == self.account_id:
-              self.subnet_node_eligible = True
-              break
+          submittable_index, _ = self._get_submittable_index(self.subnet_id)
+          self.subnet_node_eligible = self.account_id in submittable_index
           
           if self.subnet_node_eligible == False:
             # If included, query consensus data anyway and save to self.previous_epoch_data
@@ -147,18 +200,20 @@ class Consensus(threading.Thread):
               self.attest(epoch, attest =False)
 
             logger.info("Node not eligible for consensus, sleeping until next epoch")
-            time.sleep(remaining_blocks_until_next_epoch * BLOCK_SECS)
+            if self._sleep_until_next_epoch(next_epoch_start_block, remaining_blocks_until_next_epoch):
+              return
             continue
 
         # is epoch submitted yet
 
         # is validator?
-        validator = self._get_validator(epoch)
+        validator = rewards_validator
 
         # a validator is not chosen if there are not enough nodes, or the subnet is deactivated
         if validator == None:
           logger.info("Validator not chosen for epoch %s yet, checking next block" % epoch)
-          time.sleep(BLOCK_SECS)
+          if self._sleep(BLOCK_SECS):
+            return
           continue
         else:
           logger.info("Validator for epoch %s is %s" % (epoch, validator))
@@ -167,15 +222,16 @@ class Consensus(threading.Thread):
         if is_validator:
           logger.info("We're the chosen validator for epoch %s, validating and auto-attesting..." % epoch)
           # check if validated 
-          validated = self._get_validator_consensus_submission(epoch)
+          validated = rewards_submission
           if validated == None:
-            success = self.validate()
+            success = self.validate(epoch)
             # update last validated epoch and continue (this validates and attests in one call)
             if success:
               self.last_validated_or_attested_epoch = epoch
             else:
               logger.warning("Consensus submission unsuccessful, waiting until next block to try again")
-              time.sleep(BLOCK_SECS)
+              if self._sleep(BLOCK_SECS):
+                return
               continue
           else:
             # if for any reason on the last attempt it succeeded but didn't propogate
@@ -183,7 +239,8 @@ class Consensus(threading.Thread):
             self.last_validated_or_attested_epoch = epoch
 
           # continue to next epoch, no need to attest
-          time.sleep(remaining_blocks_until_next_epoch * BLOCK_SECS)
+          if self._sleep_until_next_epoch(next_epoch_start_block, remaining_blocks_until_next_epoch):
+            return
           continue
 
         # we are not validator, we must attest or not attest
@@ -195,11 +252,12 @@ class Consensus(threading.Thread):
         logger.info("Starting attestation check")
         while True:
           # wait for validator on every block
-          time.sleep(BLOCK_SECS)
-          block_number = get_block_number(self.substrate_config.interface)
+          block_number = self._wait_for_next_block()
+          if block_number is None:
+            return
           logger.info("Block height: %s " % block_number)
 
-          epoch = int(block_number / self.epoch_length)
+          epoch = block_number // self.epoch_length
           logger.info("Epoch: %s " % epoch)
 
           next_epoch_start_block = get_next_epoch_start_block(
@@ -229,15 +287,18 @@ class Consensus(threading.Thread):
               break
             elif reason == AttestReason.SHOULD_NOT_ATTEST:
               # sleep until end of epoch to check if we should attest
+              # the DHT may have changed by then, so rerun the scoring protocol on the next check
+              self._my_consensus_cache.pop(epoch, None)
 
               # sleep until latter half of the epoch to attest
               delta = remaining_blocks_until_next_epoch / 2
 
               # ensure attestor has at least 2 blocks to run compute
-              if delta / 2 < BLOCK_SECS * 2:
+              if delta / 2 < _MIN_ATTEST_DELTA:
                 delta = 0
 
-              time.sleep(saturating_sub(delta * BLOCK_SECS, BLOCK_SECS))
+              if self._sleep(max(0, delta * BLOCK_SECS - BLOCK_SECS)):
+                return
               continue
             # If False, still waiting for validator to submit data
             continue
@@ -248,7 +309,7 @@ class Consensus(threading.Thread):
       except Exception as e:
         logger.error("Consensus Error: %s" % e, exc_info=True)
 
-  def validate(self) -> bool:
+  def validate(self, epoch: int) -> bool:
     """
     Calculate incentives data based on the scoring protocol and submit consensus
 
@@ -256,7 +317,7 @@ class Consensus(threading.Thread):
       bool: If successful
     """
     # TODO: Add exception handling
-    consensus_data = self._get_consensus_data()
+    consensus_data = self._get_consensus_data(epoch)
     return self._do_validate(consensus_data["peers"])
 
   def attest(self, epoch: int, attest: Optional[bool] = True) -> Tuple[bool, AttestReason]:
@@ -276,15 +337,16 @@ class Consensus(threading.Thread):
       return False, AttestReason.WAITING
 
     # backup check if validator node restarts in the middle of an epoch to ensure they don't tx again
-    if self._has_attested(validator_consensus_submission["attests"]):
+    if self._has_attested(epoch, validator_consensus_submission["attests"]):
       logger.info("Has attested already")
       return False, AttestReason.ATTESTED
     
-    validator_consensus_data = RewardsData.list_from_scale_info(validator_consensus_submission["data"])
+    # decoded lazily, ``should_attest`` streams the records into its comparison set
+    validator_consensus_data = RewardsData.iter_from_scale_info(validator_consensus_submission["data"])
     
     logger.info("Checking if we should attest the validators submission")
     logger.info("Generating consensus data")
-    consensus_data = self._get_consensus_data() # should always return `peers` key
+    consensus_data = self._get_consensus_data(epoch) # should always return `peers` key
 
     # if not in validator data, check if we're still Submittable
     in_validator_data = True
@@ -309,19 +371,28 @@ class Consensus(threading.Thread):
       return False, AttestReason.SHOULD_NOT_ATTEST
   
   def is_submittable(self) -> bool:
+    submittable_index, _ = self._get_submittable_index(self.subnet_id)
+    return self.account_id in submittable_index
+
+  def _get_submittable_index(self, subnet_id: int) -> Tuple[Dict[str, Tuple[int, SubnetNode]], List[SubnetNode]]:
+    """
+    Get the submittable nodes and an index of them by account ID, queried at most once per epoch
+
+    Returns:
+      Tuple[Dict[str, Tuple[int, SubnetNode]], List[SubnetNode]]: ``{account_id: (entry index, node)}``, submittable nodes
+    """
+    key = (subnet_id, self.last_block_number // self.epoch_length)
+    if self._submittable_index_cache is not None and self._submittable_index_cache[0] == key:
+      return self._submittable_index_cache[1]
+
     submittable_nodes = get_submittable_nodes(
       self.substrate_config.interface,
-      self.subnet_id,
+      subnet_id,
     )
+    submittable_index = {node_set.account_id: (i, node_set) for i, node_set in enumerate(submittable_nodes)}
 
-    _is = False
-    #  wait until we are submittable
-    for node_set in submittable_nodes:
-      if node_set.account_id == self.account_id:
-        _is = True
-        break
-
-    return _is
+    self._submittable_index_cache = (key, (submittable_index, submittable_nodes))
+    return submittable_index, submittable_nodes
 
   def is_included(self) -> bool:
     included_nodes = get_included_nodes(
@@ -366,14 +437,22 @@ class Consensus(threading.Thread):
       logger.error("Attestation Error: %s" % e)
       return False
     
-  def _get_consensus_data(self):
-    """"""
+  def _get_consensus_data(self, epoch: int):
+    """Get the scoring protocols consensus data, computed at most once per epoch"""
+    if epoch in self._my_consensus_cache:
+      return {"peers": self._my_consensus_cache[epoch]}
+
     # TODO: Add exception handling
     consensus_data = get_consensus_data(
       self.substrate_config.interface, 
       self.subnet_id, 
       self.scoring_protocol
     )
+
+    self._my_consensus_cache[epoch] = consensus_data["peers"]
+    for key in [key for key in self._my_consensus_cache if key < epoch - 1]:
+      del self._my_consensus_cache[key]
+
     return consensus_data
 
   def _get_validator_consensus_submission(self, epoch: int):
@@ -383,23 +462,79 @@ class Consensus(threading.Thread):
       self.subnet_id,
       epoch
     )
+    self._cache_submission_data(epoch, rewards_submission)
     return rewards_submission
 
-  def _has_attested(self, attestations) -> bool:
-    """Get and return the consensus data from the current validator"""
-    for data in attestations:
-      if data[0] == self.account_id:
-        return True
-    return False
+  def _get_submission_data(self, epoch: int):
+    """Get the data of an epochs submission, ``None`` if not submitted"""
+    if epoch in self._submission_data_cache:
+      return self._submission_data_cache[epoch]
+
+    rewards_submission = self._get_validator_consensus_submission(epoch)
+    return None if rewards_submission == None else rewards_submission["data"]
+
+  def _cache_submission_data(self, epoch: int, rewards_submission):
+    """Cache the data of an epochs submission, its attestations are left out"""
+    if rewards_submission == None:
+      return
+    self._cache_epoch_value(self._submission_data_cache, epoch, rewards_submission["data"])
+
+  def _has_attested(self, epoch: int, attestations) -> bool:
+    """Check if we are in the attestations of the epochs submission"""
+    key = (epoch, len(attestations))
+    if self._attesters_cache is None or self._attesters_cache[0] != key:
+      self._attesters_cache = (key, frozenset(data[0] for data in attestations))
+    return self.account_id in self._attesters_cache[1]
 
   def _get_validator(self, epoch):
+    if epoch in self._validator_cache:
+      return self._validator_cache[epoch]
+
     validator = get_rewards_validator(
       self.substrate_config.interface,
       self.subnet_id,
       epoch
     )
+    self._cache_epoch_value(self._validator_cache, epoch, validator)
     return validator
+
+  def _cache_epoch_value(self, cache: dict, epoch: int, value):
+    """
+    Cache an epochs validator or submission data once it exists onchain, neither changes afterwards
+
+    Evicts entries older than ``epoch - 2``
+    """
+    if value == None:
+      return
+
+    cache[epoch] = value
+    for key in [key for key in cache if key < epoch - 2]:
+      del cache[key]
   
+  def _get_epoch_state(self):
+    """
+    Get the block number, the rewards validator and the rewards submission of the current epoch in one batched request
+
+    The epoch is estimated from the last seen block height, if the batch lands in a new epoch the
+    validator and submission are queried again for it
+    """
+    estimated_epoch = self.last_block_number // self.epoch_length
+    block_number, (rewards_validator, rewards_submission) = self.substrate_config.query_with_block_number([
+      ('Network', 'SubnetRewardsValidator', [self.subnet_id, estimated_epoch]),
+      ('Network', 'SubnetRewardsSubmission', [self.subnet_id, estimated_epoch]),
+    ])
+    self.last_block_number = block_number
+
+    epoch = block_number // self.epoch_length
+    if epoch != estimated_epoch:
+      rewards_validator = self._get_validator(epoch)
+      rewards_submission = self._get_validator_consensus_submission(epoch)
+    else:
+      self._cache_epoch_value(self._validator_cache, epoch, rewards_validator)
+      self._cache_submission_data(epoch, rewards_submission)
+
+    return block_number, rewards_validator, rewards_submission
+
   def _activate_subnet(self):
     """
     Activates subnet
@@ -410,30 +545,38 @@ class Consensus(threading.Thread):
     Returns:
       bool: If activated
     """
-    subnet_id = get_subnet_id_by_path(self.substrate_config.interface, self.path)
-    if subnet_id.meta_info['result_found'] is False:
-      logger.error("Cannot find subnet ID at path: %s, shutting down", self.path)
-      self.shutdown()
-      return False
-    
-    subnet_data = get_subnet_data(
-      self.substrate_config.interface,
-      int(str(subnet_id))
-    )
+    # the path to subnet ID mapping is immutable, only look it up once
+    if self._subnet_id_cache is None:
+      subnet_id = get_subnet_id_by_path(self.substrate_config.interface, self.path)
+      if subnet_id.meta_info['result_found'] is False:
+        logger.error("Cannot find subnet ID at path: %s, shutting down", self.path)
+        self.shutdown()
+        return False
+      self._subnet_id_cache = _to_int(subnet_id)
+    subnet_id = self._subnet_id_cache
+
+    # read the block number along with the subnet data, it's used for the activation window below
+    block_number, (subnet_data,) = self.substrate_config.query_with_block_number([
+      ('Network', 'SubnetsData', [subnet_id]),
+    ])
     if subnet_data.meta_info['result_found'] is False:
       logger.error("Cannot find subnet data at ID: %s, shutting down", subnet_id)
       self.shutdown()
       return False
+    self.last_block_number = block_number
 
-    initialized = int(str(subnet_data['initialized']))
-    registration_blocks = int(str(subnet_data['registration_blocks']))
-    activation_block = initialized + registration_blocks
+    # the activation block is fixed at registration
+    if self._activation_block_cache is None:
+      initialized = subnet_data.value['initialized']
+      registration_blocks = subnet_data.value['registration_blocks']
+      self._activation_block_cache = initialized + registration_blocks
+    activation_block = self._activation_block_cache
 
     # if we didn't activate the subnet, someone indexed before us should have - see logic below
-    if subnet_data['activated'] > 0:
+    if subnet_data.value['activated'] > 0:
       self.subnet_accepting_consensus = True
-      self.subnet_id = int(str(subnet_id))
-      self.subnet_activated = int(str(subnet_data["activated"]))
+      self.subnet_id = subnet_id
+      self.subnet_activated = subnet_data.value["activated"]
       logger.info("Subnet activated")
       return True
 
@@ -442,57 +585,67 @@ class Consensus(threading.Thread):
     # randomize activating subnet by node entry index
     # when subnet is in registration, all new subnet nodes are ``Submittable`` classification
     # so we check all submittable nodes
-    submittable_nodes = get_submittable_nodes(
-      self.substrate_config.interface,
-      int(str(subnet_id)),
-    )
+    submittable_index, _ = self._get_submittable_index(subnet_id)
 
-    submittable = False
-    n = 0
-    for node_set in submittable_nodes:
-      n+=1
-      if node_set.account_id == self.account_id:
-        submittable = True
-        break
+    entry = submittable_index.get(self.account_id)
+    submittable = entry is not None
+    n = entry[0] + 1 if entry else 0
     
     # redundant
     # if we made it this far and the node is not yet activated, the subnet should be activated
+    # ``run()`` will check again on the next block
     if not submittable:
-      time.sleep(BLOCK_SECS)
-      self._activate_subnet()
-    
-    min_node_activation_block = activation_block + BLOCK_SECS*10 * (n-1)
-    max_node_activation_block = activation_block + BLOCK_SECS*10 * n
-
-    block_number = get_block_number(self.substrate_config.interface)
-
-    # If outside of activation period on both ways
-    if block_number < min_node_activation_block:
-      delta = min_node_activation_block - block_number
-      time.sleep(BLOCK_SECS*delta)
-      self._activate_subnet()
+      return False
     
-    # someone of me should have activated by now, keep iterating
-    # this will print a warning to manually activate
-    if block_number >= max_node_activation_block:
-      logger.warning("We skipped subnet activation, attempt to manually activate")
-      time.sleep(BLOCK_SECS)
-      self._activate_subnet()
-
+    min_node_activation_block = activation_block + _BLOCK_SECS_X10 * (n-1)
+    max_node_activation_block = min_node_activation_block + _BLOCK_SECS_X10
 
-    # if within our designated activation block, then activate
-    # activation is a no-weight transaction, meaning it costs nothing to do
-    if block_number >= min_node_activation_block and block_number < max_node_activation_block:
+    # everything above is fixed for the registration period, only the block number
+    # and the subnets activation status are re-read while waiting
+    while not self.stop.is_set():
+      # If outside of activation period on both ways
+      if block_number < min_node_activation_block:
+        delta = min_node_activation_block - block_number
+        if self._sleep(BLOCK_SECS*delta):
+          return False
+        block_number = get_block_number(self.substrate_config.interface)
+        continue
+
+      # someone of me should have activated by now, keep iterating
+      # this will print a warning to manually activate
+      if block_number >= max_node_activation_block:
+        logger.warning("We skipped subnet activation, attempt to manually activate")
+        if self._sleep(BLOCK_SECS):
+          return False
+        subnet_data = get_subnet_data(
+          self.substrate_config.interface,
+          subnet_id
+        )
+        if subnet_data.meta_info['result_found'] is False:
+          logger.error("Cannot find subnet data at ID: %s, shutting down", subnet_id)
+          self.shutdown()
+          return False
+
+        if subnet_data.value['activated'] > 0:
+          self.subnet_accepting_consensus = True
+          self.subnet_id = subnet_id
+          self.subnet_activated = subnet_data.value["activated"]
+          logger.info("Subnet activated")
+          return True
+        continue
+
+      # if within our designated activation block, then activate
+      # activation is a no-weight transaction, meaning it costs nothing to do
       # check if activated already by another node
       subnet_data = get_subnet_data(
         self.substrate_config.interface,
-        int(str(subnet_id))
+        subnet_id
       )
 
       # check if already activated
-      if subnet_data['activated'] > 0:
+      if subnet_data.value['activated'] > 0:
         self.subnet_accepting_consensus = True
-        self.subnet_id = int(str(subnet_id))
+        self.subnet_id = subnet_id
         self.subnet_activated = True
         logger.info("Subnet activated")
         return True
@@ -503,7 +656,7 @@ class Consensus(threading.Thread):
       receipt = activate_subnet(
         self.substrate_config.interface,
         self.substrate_config.keypair,
-        int(str(subnet_id)),
+        subnet_id,
       )
 
       if receipt == None:
@@ -524,35 +677,38 @@ class Consensus(threading.Thread):
         
       if is_success:
         self.subnet_accepting_consensus = True
-        self.subnet_id = int(str(subnet_id))
+        self.subnet_id = subnet_id
         self.subnet_activated = True
         return True
       else:
         logger.warning("Subnet activation failed, subnet didn't meet requirements")
 
-    # check if subnet failed to be activated
-    # this means:
-    # someone else activated it and code miscalculated (contact devs with error if so)
-    # or the subnet didn't meet its activation requirements and should revert on the next ``_activate_subnet`` call
+      # check if subnet failed to be activated
+      # this means:
+      # someone else activated it and code miscalculated (contact devs with error if so)
+      # or the subnet didn't meet its activation requirements and should revert on the next ``_activate_subnet`` call
+      return False
+
     return False
 
   def should_attest(self, validator_data, my_data, epoch):
     """Checks if two arrays of dictionaries match, regardless of order."""
 
-    # if validator submitted no data, and we have also found the subnet is broken
-    if len(validator_data) == 0 and len(my_data) == 0:
-      return True
-    
-    # otherwise, check the data matches
-    # at this point, the
-    
-    # use ``asdict`` because data is decoded from blockchain as dataclass
+    # validator data is decoded from blockchain as dataclass and my data is a list of dicts,
+    # both are reduced to tuples of their field values
+    # validator data can be an iterator of decoded records, so it's consumed once here
     # we assume the lists are consistent across all elements
     # Convert validator_data to a set
-    set1 = set(frozenset(asdict(d).items()) for d in validator_data)
+    set1 = set(map(_canonicalize, validator_data))
 
     # Convert my_data to a set
-    set2 = set(frozenset(d.items()) for d in my_data)
+    set2 = set(map(_canonicalize, my_data))
+
+    # if validator submitted no data, and we have also found the subnet is broken
+    if len(set1) == 0 and len(set2) == 0:
+      return True
+    
+    # otherwise, check the data matches
 
     success = set1 == set2
 
@@ -571,16 +727,10 @@ class Consensus(threading.Thread):
       """
       If this is the nodes first epoch after a restart of the node, check last epochs consensus data
       """
-      previous_epoch_validator_data = self._get_validator_consensus_submission(epoch-1)
-      # This is a backup so we ensure the data was super majority attested to use it
-      if previous_epoch_validator_data != None:
-        _, attestation_percentage = self._get_reward_result(epoch)
-        if attestation_percentage / 1e9 < .875:
-          success = False
-        else:
-          previous_epoch_data_onchain = set(frozenset(asdict(d).items()) for d in previous_epoch_validator_data)
-          dif = set1.symmetric_difference(set2)
-          success = dif.issubset(previous_epoch_data_onchain)
+      previous_epoch_data_onchain = self._get_previous_epoch_data_onchain(epoch)
+      if previous_epoch_data_onchain is not None:
+        dif = set1.symmetric_difference(set2)
+        success = dif.issubset(previous_epoch_data_onchain)
     else:
       # log only data
       intersection = set1.intersection(set2)
@@ -588,10 +738,43 @@ class Consensus(threading.Thread):
       logger.info("Validator matching intersection of %s my data" % (saturating_div(len(intersection), len(set2)) * 100))
 
     # update previous epoch data
+    # ``set2`` only holds tuples, keeping it doesn't retain ``my_data``
     self.previous_epoch_data = set2
 
     return success
 
+  def _get_previous_epoch_data_onchain(self, epoch: int) -> Optional[set]:
+    """
+    Get the previous epochs validator submission as a set of canonical tuples
+
+    Returns:
+      Optional[set]: ``None`` if there was no submission or it wasn't super majority attested
+    """
+    if epoch-1 in self._prev_epoch_onchain_cache:
+      return self._prev_epoch_onchain_cache[epoch-1]
+
+    previous_epoch_validator_data = self._get_submission_data(epoch-1)
+    if previous_epoch_validator_data == None:
+      self._prev_epoch_onchain_cache = {epoch-1: None}
+      return None
+
+    # This is a backup so we ensure the data was super majority attested to use it
+    reward_result = self._get_reward_result(epoch)
+    if reward_result is None:
+      # don't cache, the event query may succeed on the next check
+      return None
+
+    _, attestation_percentage = reward_result
+    if attestation_percentage / 1e9 < .875:
+      previous_epoch_data_onchain = None
+    else:
+      previous_epoch_data_onchain = set(
+        map(_canonicalize, RewardsData.iter_from_scale_info(previous_epoch_validator_data))
+      )
+
+    self._prev_epoch_onchain_cache = {epoch-1: previous_epoch_data_onchain}
+    return previous_epoch_data_onchain
+
   def _get_reward_result(self, epoch: int):
     try:
       event = get_reward_result_event(
@@ -606,5 +789,67 @@ class Consensus(threading.Thread):
       return None
 
 
+  def _wait_for_next_block(self) -> Optional[int]:
+    """
+    Wait for the next block header pushed by the new heads subscription
+
+    Falls back to polling the block number each block on HTTP connections, or if no header
+    arrives within a block, e.g. while the subscription reconnects
+
+    Returns:
+      Optional[int]: Block number, ``None`` if shutdown
+    """
+    block_number = None
+    if self._subscribed_new_heads:
+      # discard a header that arrived before we started waiting
+      try:
+        self._head_queue.get_nowait()
+      except queue.Empty:
+        pass
+
+      # wait in one second steps so shutdown isn't held up
+      for _ in range(BLOCK_SECS):
+        if self.stop.is_set():
+          return None
+        try:
+          header = self._head_queue.get(timeout=1)
+          block_number = int(header['number'], 16)
+          break
+        except queue.Empty:
+          continue
+    elif self._sleep(BLOCK_SECS):
+      return None
+
+    if block_number is None:
+      block_number = get_block_number(self.substrate_config.interface)
+
+    if self.stop.is_set():
+      return None
+
+    self.last_block_number = block_number
+    return block_number
+
+  def _sleep_until_next_epoch(self, next_epoch_start_block: int, remaining_blocks: int) -> bool:
+    """
+    Sleep until the start of the next epoch or until shutdown
+
+    The last seen block height is moved to ``next_epoch_start_block`` so the first ``_get_epoch_state``
+    after waking batches the new epochs validator and submission
+
+    Returns:
+      bool: If shutdown
+    """
+    self.last_block_number = next_epoch_start_block
+    return self._sleep(remaining_blocks * BLOCK_SECS)
+
+  def _sleep(self, secs) -> bool:
+    """
+    Sleep for ``secs`` or until shutdown
+
+    Returns:
+      bool: If shutdown
+    """
+    return self.stop.wait(secs)
+
   def shutdown(self):
     self.stop.set()
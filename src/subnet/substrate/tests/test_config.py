@@ -0,0 +1,229 @@
+import json
+import queue
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from substrateinterface.exceptions import SubstrateRequestException
+from tenacity import stop_after_attempt
+
+from subnet.substrate.config import HTTP_TIMEOUT, SubstrateConfigCustom
+
+# python src/subnet/substrate/tests/test_config.py
+
+PHRASE = "//Alice"
+
+def batch_rpc_once(config: SubstrateConfigCustom, calls):
+  """Runs ``_batch_rpc`` without its retries"""
+  return SubstrateConfigCustom._batch_rpc.retry_with(stop=stop_after_attempt(1), reraise=True)(config, calls)
+
+class TestBatchRpc(unittest.TestCase):
+
+  def setUp(self):
+    patcher = patch("subnet.substrate.config.PersistentSubstrateInterface")
+    self.addCleanup(patcher.stop)
+    patcher.start()
+
+    self.config = SubstrateConfigCustom(PHRASE, "ws://127.0.0.1:9944")
+    self.interface = self.config.interface
+    self.interface.request_id = 5
+    self.interface.request_lock = threading.RLock()
+    self.interface.websocket.connected = True
+
+    self.sent = []
+    self.frames = []
+    self.interface.websocket.send.side_effect = self.sent.append
+    self.interface.websocket.recv.side_effect = lambda: self.frames.pop(0)
+
+  def reply_to_last_batch(self, results):
+    payload = json.loads(self.sent[-1])
+    return json.dumps([
+      {"jsonrpc": "2.0", "id": request["id"], "result": result}
+      for request, result in zip(payload, results)
+    ])
+
+  def test_keys_responses_by_call_index(self):
+    self.interface.websocket.send.side_effect = lambda message: (
+      self.sent.append(message),
+      self.frames.append(self.reply_to_last_batch(["a", "b"])),
+    )
+
+    responses = batch_rpc_once(self.config, [("chain_getHeader", []), ("state_getStorage", ["0x00"])])
+
+    self.assertEqual(responses[0]["result"], "a")
+    self.assertEqual(responses[1]["result"], "b")
+    # ids are reserved from the interfaces request counter
+    self.assertEqual([request["id"] for request in json.loads(self.sent[0])], [5, 6])
+    self.assertEqual(self.interface.request_id, 7)
+
+  def test_skips_stale_frames(self):
+    """A reply left on the connection from an earlier request isn't taken as this batches reply"""
+    def send(message):
+      self.sent.append(message)
+      self.frames.append(json.dumps([{"jsonrpc": "2.0", "id": 1, "result": "stale"}]))
+      self.frames.append(json.dumps({"jsonrpc": "2.0", "id": 2, "result": "stale"}))
+      self.frames.append(self.reply_to_last_batch(["fresh"]))
+    self.interface.websocket.send.side_effect = send
+
+    responses = batch_rpc_once(self.config, [("chain_getHeader", [])])
+
+    self.assertEqual(responses[0]["result"], "fresh")
+
+  def test_rejected_batch_raises(self):
+    self.frames.append(json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid request"}}))
+
+    with self.assertRaises(SubstrateRequestException):
+      batch_rpc_once(self.config, [("chain_getHeader", [])])
+
+  def test_http_request_has_timeout(self):
+    self.config.url = "http://127.0.0.1:9933"
+
+    with patch("subnet.substrate.config.requests.post") as post:
+      post.return_value.status_code = 200
+      post.return_value.json.return_value = [{"jsonrpc": "2.0", "id": 5, "result": "a"}]
+      responses = batch_rpc_once(self.config, [("chain_getHeader", [])])
+
+    self.assertEqual(responses[0]["result"], "a")
+    self.assertEqual(post.call_args.kwargs["timeout"], HTTP_TIMEOUT)
+
+class TestQueryWithBlockNumber(unittest.TestCase):
+
+  def setUp(self):
+    patcher = patch("subnet.substrate.config.PersistentSubstrateInterface")
+    self.addCleanup(patcher.stop)
+    patcher.start()
+
+    self.config = SubstrateConfigCustom(PHRASE, "ws://127.0.0.1:9944")
+
+    storage_key_patcher = patch("subnet.substrate.config.StorageKey")
+    self.addCleanup(storage_key_patcher.stop)
+    self.storage_key = storage_key_patcher.start().create_from_storage_function.return_value
+    self.storage_key.to_hex.return_value = "0xabcd"
+
+  def test_decodes_block_number_and_storage(self):
+    self.config._batch_rpc = MagicMock(return_value={
+      0: {"id": 0, "result": {"number": "0x1a2b"}},
+      1: {"id": 1, "result": "0x01"},
+    })
+
+    block_number, (value,) = self.config.query_with_block_number([("Network", "SubnetsData", [1])])
+
+    self.assertEqual(block_number, 0x1a2b)
+    self.assertEqual(value, self.storage_key.decode_scale_value.return_value)
+    self.assertEqual(self.config._batch_rpc.call_args.args[0], [
+      ("chain_getHeader", []),
+      ("state_getStorage", ["0xabcd"]),
+    ])
+
+  def test_missing_storage_decodes_default(self):
+    """Storage that was never set is decoded from ``None``, giving its default value"""
+    self.config._batch_rpc = MagicMock(return_value={
+      0: {"id": 0, "result": {"number": "0x1"}},
+      1: {"id": 1, "result": None},
+    })
+
+    self.config.query_with_block_number([("Network", "SubnetRewardsSubmission", [1, 0])])
+
+    self.storage_key.decode_scale_value.assert_called_once_with(None)
+
+  def test_error_response_raises(self):
+    self.config._batch_rpc = MagicMock(return_value={
+      0: {"id": 0, "result": {"number": "0x1"}},
+      1: {"id": 1, "error": {"code": -32602, "message": "Invalid params"}},
+    })
+
+    with self.assertRaises(SubstrateRequestException):
+      self.config.query_with_block_number([("Network", "SubnetsData", [1])])
+
+class TestNewHeadsSubscription(unittest.TestCase):
+
+  def setUp(self):
+    patcher = patch("subnet.substrate.config.PersistentSubstrateInterface")
+    self.addCleanup(patcher.stop)
+    patcher.start()
+
+    self.config = SubstrateConfigCustom(PHRASE, "ws://127.0.0.1:9944")
+
+    # sockets opened by the subscription thread
+    self.interfaces = []
+    interface_patcher = patch("subnet.substrate.config.SubstrateInterface", side_effect=self.new_interface)
+    self.addCleanup(interface_patcher.stop)
+    interface_patcher.start()
+
+    sleep_patcher = patch("subnet.substrate.config.time.sleep")
+    self.addCleanup(sleep_patcher.stop)
+    sleep_patcher.start()
+
+  def new_interface(self, url):
+    interface = MagicMock()
+    interface.rpc_request.side_effect = self.rpc_request
+    self.interfaces.append(interface)
+    return interface
+
+  def publish_until_stopped(self, result_handler):
+    """Publishes headers until the handler ends the subscription"""
+    number = 0
+    while not result_handler({"params": {"result": {"number": hex(number)}}}, number, "0x1"):
+      number += 1
+
+  def join_subscription(self):
+    thread = self.config._head_thread
+    if thread is not None:
+      thread.join(timeout=5)
+    self.assertIsNone(self.config._head_thread)
+
+  def test_http_does_not_subscribe(self):
+    self.config.url = "http://127.0.0.1:9933"
+
+    self.assertFalse(self.config.subscribe_new_heads(queue.Queue(maxsize=1), threading.Event()))
+    self.assertEqual(self.interfaces, [])
+
+  def test_fans_out_to_subscribers(self):
+    """Subscribers share one subscription, which ends once they have all stopped"""
+    queues = [queue.Queue(maxsize=1), queue.Queue(maxsize=1)]
+    stops = [threading.Event(), threading.Event()]
+    subscribed = threading.Event()
+    received = [[], []]
+
+    def rpc_request(method, params, result_handler):
+      subscribed.wait(timeout=5)
+      for number in range(3):
+        result_handler({"params": {"result": {"number": hex(number)}}}, number, "0x1")
+        for i, head_queue in enumerate(queues):
+          received[i].append(head_queue.get_nowait()["number"])
+      for stop in stops:
+        stop.set()
+      self.publish_until_stopped(result_handler)
+    self.rpc_request = rpc_request
+
+    self.assertTrue(self.config.subscribe_new_heads(queues[0], stops[0]))
+    self.assertTrue(self.config.subscribe_new_heads(queues[1], stops[1]))
+    subscribed.set()
+    self.join_subscription()
+
+    self.assertEqual(len(self.interfaces), 1)
+    self.assertEqual(received, [["0x0", "0x1", "0x2"], ["0x0", "0x1", "0x2"]])
+
+  def test_closes_failed_subscription(self):
+    stop = threading.Event()
+    attempts = []
+
+    def rpc_request(method, params, result_handler):
+      attempts.append(method)
+      if len(attempts) == 1:
+        raise ConnectionResetError()
+      stop.set()
+      self.publish_until_stopped(result_handler)
+    self.rpc_request = rpc_request
+
+    self.config.subscribe_new_heads(queue.Queue(maxsize=1), stop)
+    self.join_subscription()
+
+    # resubscribed once, each socket is released
+    self.assertEqual(len(self.interfaces), 2)
+    for interface in self.interfaces:
+      interface.close.assert_called_once()
+
+# Run the tests
+if __name__ == "__main__":
+  unittest.main()